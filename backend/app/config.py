@@ -3,11 +3,13 @@ Configuration settings for the Medical Clinic Booking System.
 """
 
 import os
+import time
 from datetime import datetime
+from functools import cached_property
 from typing import Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
-import pytz
+from zoneinfo import ZoneInfo
 
 
 class Settings(BaseSettings):
@@ -22,6 +24,12 @@ class Settings(BaseSettings):
     redis_username: str = Field(default="default", alias="REDIS_USERNAME")
     redis_password: str = Field(default="", alias="REDIS_PASSWORD")
     redis_url: Optional[str] = Field(default=None, alias="REDIS_URL")
+    redis_unix_socket: Optional[str] = Field(
+        default=None,
+        alias="REDIS_UNIX_SOCKET",
+        description="Path to a Redis UNIX socket; bypasses host/port when set "
+                    "(avoids loopback TCP overhead on colocated deployments)"
+    )
     
     # Business Rules Configuration
     daily_discount_quota: int = Field(
@@ -69,31 +77,51 @@ class Settings(BaseSettings):
         """Construct Redis URL from components or return provided URL."""
         if self.redis_url:
             return self.redis_url
+        if self.redis_unix_socket:
+            return f"unix://{self.redis_username}:{self.redis_password}@{self.redis_unix_socket}"
         return f"redis://{self.redis_username}:{self.redis_password}@{self.redis_host}:{self.redis_port}"
     
-    def get_timezone(self) -> pytz.timezone:
+    @cached_property
+    def tz(self) -> ZoneInfo:
+        """Timezone object, built once per process."""
+        return ZoneInfo(self.timezone)
+
+    def get_timezone(self) -> ZoneInfo:
         """Get timezone object."""
-        return pytz.timezone(self.timezone)
-    
+        return self.tz
+
     def get_today_ist(self) -> str:
         """Get today's date in IST as string (YYYY-MM-DD)."""
-        tz = self.get_timezone()
-        return datetime.now(tz).strftime("%Y-%m-%d")
-    
+        # Tiny TTL cache: this runs on every SAGA step and quota check, so
+        # recompute the strftime at most once per minute.
+        now_minute = int(time.time() // 60)
+        cached = self.__dict__.get("_today_ist_cache")
+        if cached is not None and cached[0] == now_minute:
+            return cached[1]
+        today = datetime.now(self.tz).strftime("%Y-%m-%d")
+        self.__dict__["_today_ist_cache"] = (now_minute, today)
+        return today
+
     def get_current_time_ist(self) -> datetime:
         """Get current datetime in IST."""
-        tz = self.get_timezone()
-        return datetime.now(tz)
-    
+        return datetime.now(self.tz)
+
     def get_seconds_until_midnight_ist(self) -> int:
         """Calculate seconds until midnight IST for Redis key expiration."""
-        tz = self.get_timezone()
-        now = datetime.now(tz)
-        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        if now >= midnight:
+        # Cache the next-midnight epoch so each call is one time.time()
+        # instead of two datetime constructions plus tz math; recompute
+        # lazily once the cached midnight has passed.
+        now = time.time()
+        midnight_epoch = self.__dict__.get("_midnight_epoch_cache", 0.0)
+        if now >= midnight_epoch:
             from datetime import timedelta
-            midnight += timedelta(days=1)
-        return int((midnight - now).total_seconds())
+            dt_now = datetime.now(self.tz)
+            midnight = (dt_now + timedelta(days=1)).replace(
+                hour=0, minute=0, second=0, microsecond=0
+            )
+            midnight_epoch = midnight.timestamp()
+            self.__dict__["_midnight_epoch_cache"] = midnight_epoch
+        return int(midnight_epoch - now)
 
 
 # Global settings instance
@@ -3,7 +3,8 @@ Medical services catalog.
 Gender-specific services with pricing.
 """
 
-from typing import Dict, List
+from functools import lru_cache
+from typing import Dict, List, Tuple
 from app.models.schemas import MedicalService
 
 
@@ -94,36 +95,47 @@ FEMALE_SERVICES: List[MedicalService] = [
 ]
 
 
+# Precomputed id→service maps, built once at import so lookups are O(1)
+# instead of scanning the service lists per booking.
+_SERVICES_BY_GENDER: Dict[str, List[MedicalService]] = {
+    "male": MALE_SERVICES,
+    "female": FEMALE_SERVICES,
+}
+_SERVICE_BY_ID: Dict[str, Dict[str, MedicalService]] = {
+    gender: {s.id: s for s in services}
+    for gender, services in _SERVICES_BY_GENDER.items()
+}
+
+
 def get_services_by_gender(gender: str) -> List[MedicalService]:
     """Get services based on gender."""
-    if gender.lower() == "male":
-        return MALE_SERVICES
-    elif gender.lower() == "female":
-        return FEMALE_SERVICES
-    else:
+    try:
+        return _SERVICES_BY_GENDER[gender.lower()]
+    except KeyError:
         raise ValueError(f"Invalid gender: {gender}")
 
 
 def get_service_by_id(service_id: str, gender: str) -> MedicalService:
     """Get a specific service by ID and gender."""
-    services = get_services_by_gender(gender)
-    for service in services:
-        if service.id == service_id:
-            return service
-    raise ValueError(f"Service not found: {service_id}")
+    gender_map = _SERVICE_BY_ID.get(gender.lower())
+    if gender_map is None:
+        raise ValueError(f"Invalid gender: {gender}")
+    try:
+        return gender_map[service_id]
+    except KeyError:
+        raise ValueError(f"Service not found: {service_id}")
+
+
+@lru_cache(maxsize=2048)
+def _services_for(service_ids: Tuple[str, ...], gender: str) -> Tuple[MedicalService, ...]:
+    # Memoizable because the catalog is fixed at import and MedicalService
+    # is frozen; repeated selections skip the lookups entirely.
+    return tuple(get_service_by_id(sid, gender) for sid in service_ids)
 
 
 def get_services_by_ids(service_ids: List[str], gender: str) -> List[MedicalService]:
     """Get multiple services by IDs."""
-    services = get_services_by_gender(gender)
-    service_map = {s.id: s for s in services}
-    result = []
-    for sid in service_ids:
-        if sid in service_map:
-            result.append(service_map[sid])
-        else:
-            raise ValueError(f"Service not found: {sid}")
-    return result
+    return list(_services_for(tuple(service_ids), gender))
 
 
 def calculate_base_price(services: List[MedicalService]) -> float:
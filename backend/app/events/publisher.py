@@ -3,45 +3,102 @@ Redis event publisher for the SAGA workflow.
 Uses Redis Streams for event-driven communication.
 """
 
-import json
 import logging
-from datetime import datetime
 from typing import Dict, Any, Optional
+import orjson
 import redis.asyncio as redis
 
 from app.config import settings
-from app.models.schemas import EventType, EventPayload, TransactionState
+from app.utils import iso_utcnow
+from app.models.schemas import EventType, TransactionState
 
 logger = logging.getLogger(__name__)
 
 
 class EventPublisher:
     """Publishes events to Redis Streams."""
-    
+
     STREAM_NAME = "booking:events"
-    MAX_STREAM_LENGTH = 100  # Keep last 100 events to save space
-    
+    # Bound stream memory without trimming entries a burst of sagas has not
+    # consumed yet; '~' (approximate) lets Redis trim whole macro-nodes at
+    # near-zero cost instead of exactly on every XADD.
+    MAX_STREAM_LENGTH = 10000
+    UPDATE_CHANNEL_PREFIX = "booking:updates:"  # Per-request pub/sub for SSE
+    MAX_EVENT_LOG = 50  # Cap per-transaction audit trail (LTRIM keeps newest)
+    # Explicit pool size: each SAGA step does 2-3 round-trips and every SSE
+    # client polls continuously, so the default 50 connections starves under load.
+    MAX_CONNECTIONS = 200
+
     def __init__(self):
         self._redis: Optional[redis.Redis] = None
-    
+        self._redis_raw: Optional[redis.Redis] = None
+
+    def _make_pool(self, decode_responses: bool) -> redis.ConnectionPool:
+        """Build a sized connection pool with keepalive and health checks."""
+        return redis.ConnectionPool.from_url(
+            settings.get_redis_url(),
+            max_connections=self.MAX_CONNECTIONS,
+            decode_responses=decode_responses,
+            socket_keepalive=True,
+            health_check_interval=30
+        )
+
     async def get_redis(self) -> redis.Redis:
         """Get or create Redis connection."""
         if self._redis is None:
-            self._redis = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                username=settings.redis_username,
-                password=settings.redis_password,
-                decode_responses=True
-            )
+            self._redis = redis.Redis(connection_pool=self._make_pool(True))
         return self._redis
-    
+
+    async def get_redis_raw(self) -> redis.Redis:
+        """Get or create the binary Redis connection (msgpack state storage)."""
+        if self._redis_raw is None:
+            self._redis_raw = redis.Redis(connection_pool=self._make_pool(False))
+        return self._redis_raw
+
     async def close(self):
-        """Close Redis connection."""
+        """Close Redis connections."""
         if self._redis:
             await self._redis.close()
             self._redis = None
+        if self._redis_raw:
+            await self._redis_raw.close()
+            self._redis_raw = None
     
+    @staticmethod
+    def _stream_fields(
+        event_type: EventType,
+        request_id: str,
+        data: Optional[Dict[str, Any]]
+    ) -> Dict[str, str]:
+        """
+        Build the stream entry fields. Streams store field names per entry,
+        so short keys (t=type, r=request, d=data, ts=timestamp) cut
+        per-entry RAM and network bytes roughly in half.
+        """
+        return {
+            "t": event_type.value,
+            "r": request_id,
+            "d": orjson.dumps(data or {}).decode(),
+            "ts": iso_utcnow()
+        }
+
+    def _queue_state_save(self, pipe, state: TransactionState, key: str) -> None:
+        """Queue the delta HSET / RPUSH / EXPIRE / publish for a state save."""
+        fields = state.to_redis_hash()
+        new_events = state.pending_events()
+        updates = state.pending_updates()
+
+        if fields:
+            pipe.hset(key, mapping=fields)
+        if new_events:
+            pipe.rpush(f"{key}:events", *new_events)
+            pipe.ltrim(f"{key}:events", -self.MAX_EVENT_LOG, -1)
+        pipe.expire(key, settings.transaction_ttl_seconds)
+        pipe.expire(f"{key}:events", settings.transaction_ttl_seconds)
+        # Wake any SSE subscribers for this request (no polling on their side)
+        for update in updates:
+            pipe.publish(f"{self.UPDATE_CHANNEL_PREFIX}{state.request_id}", update)
+
     async def publish_event(
         self,
         event_type: EventType,
@@ -53,25 +110,15 @@ class EventPublisher:
         Returns the message ID.
         """
         r = await self.get_redis()
-        
-        payload = EventPayload(
-            event_type=event_type,
-            request_id=request_id,
-            data=data or {}
-        )
-        
+
         # Publish to stream with auto-trimming
         message_id = await r.xadd(
             self.STREAM_NAME,
-            {
-                "event_type": event_type.value,
-                "request_id": request_id,
-                "data": json.dumps(payload.data),
-                "timestamp": datetime.utcnow().isoformat()
-            },
-            maxlen=self.MAX_STREAM_LENGTH
+            self._stream_fields(event_type, request_id, data),
+            maxlen=self.MAX_STREAM_LENGTH,
+            approximate=True
         )
-        
+
         logger.info(
             f"Published event: {event_type.value}",
             extra={
@@ -84,47 +131,75 @@ class EventPublisher:
         return message_id
     
     async def save_transaction_state(self, state: TransactionState) -> None:
-        """Save transaction state to Redis."""
-        r = await self.get_redis()
-        key = f"txn_v2:{state.request_id}"
-        
-        await r.set(
-            key,
-            json.dumps(state.to_dict()),
-            ex=settings.transaction_ttl_seconds
-        )
-        
+        """
+        Save transaction state to Redis.
+
+        The state lives in a HASH (one msgpack-packed field per model field)
+        plus a companion list for the event audit trail. Only fields dirtied
+        since the last save are HSET and only new events are RPUSHed, so a
+        SAGA step writes a small delta instead of the full, growing blob.
+        """
+        r = await self.get_redis_raw()
+        key = f"txn_v3:{state.request_id}"
+
+        pipe = r.pipeline(transaction=False)
+        self._queue_state_save(pipe, state, key)
+        await pipe.execute()
+        state.mark_saved()
+
         logger.debug(
             f"Saved transaction state: {state.request_id}",
             extra={"status": state.status.value}
         )
-    
+
+    async def save_and_publish(
+        self,
+        state: TransactionState,
+        event_type: EventType,
+        data: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Persist state and publish its stream event in one Redis round-trip.
+
+        Equivalent to save_transaction_state followed by publish_event, but
+        issued on a single pipeline so callers pay one RTT instead of two.
+        """
+        r = await self.get_redis_raw()
+        key = f"txn_v3:{state.request_id}"
+
+        pipe = r.pipeline(transaction=False)
+        self._queue_state_save(pipe, state, key)
+        pipe.xadd(
+            self.STREAM_NAME,
+            self._stream_fields(event_type, state.request_id, data),
+            maxlen=self.MAX_STREAM_LENGTH,
+            approximate=True
+        )
+        await pipe.execute()
+        state.mark_saved()
+
+        logger.info(
+            f"Published event: {event_type.value}",
+            extra={
+                "event_type": event_type.value,
+                "request_id": state.request_id,
+                "status": state.status.value
+            }
+        )
+
     async def get_transaction_state(self, request_id: str) -> Optional[TransactionState]:
         """Retrieve transaction state from Redis."""
-        r = await self.get_redis()
-        key = f"txn_v2:{request_id}"
-        
-        data = await r.get(key)
-        if data:
-            return TransactionState.from_dict(json.loads(data))
+        r = await self.get_redis_raw()
+        key = f"txn_v3:{request_id}"
+
+        pipe = r.pipeline(transaction=False)
+        pipe.hgetall(key)
+        pipe.lrange(f"{key}:events", 0, -1)
+        fields, events = await pipe.execute()
+
+        if fields:
+            return TransactionState.from_redis_hash(fields, events)
         return None
-    
-    async def update_transaction_status(
-        self,
-        request_id: str,
-        status: str,
-        event_type: EventType,
-        message: str,
-        details: Optional[Dict] = None
-    ) -> Optional[TransactionState]:
-        """Update transaction status and add event."""
-        state = await self.get_transaction_state(request_id)
-        if state:
-            from app.models.schemas import TransactionStatus
-            state.status = TransactionStatus(status)
-            state.add_event(event_type, message, details)
-            await self.save_transaction_state(state)
-        return state
 
 
 # Global publisher instance
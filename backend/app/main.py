@@ -4,13 +4,16 @@ FastAPI main application for the Medical Clinic Booking System.
 
 import logging
 import json
+import msgpack
+import msgspec
 from datetime import datetime
 from typing import Optional, AsyncGenerator
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import orjson
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 import asyncio
 
@@ -20,51 +23,51 @@ from app.models.schemas import (
     BookingResponse,
     BookingResult,
     TransactionStatus,
+    STATUS_BY_VALUE,
     StatusUpdate,
-    Gender,
     MedicalService,
     TransactionState,
     EventType
 )
 from app.data.services import get_services_by_gender
-from app.saga.choreography import saga_choreographer
-from app.services.quota import quota_service
+from app.utils import iso_utcnow
 from app.events.publisher import event_publisher
 
-# Configure structured logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s - %(extra)s' if hasattr(logging, 'extra') else '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
-logger = logging.getLogger(__name__)
+# Saga/quota/booking services are imported lazily (lifespan / route handlers)
+# to keep cold-start import time low; see the handlers that use them.
+
+# Attributes present on every LogRecord; anything else came from extra={...}
+_STANDARD_LOG_ATTRS = frozenset({
+    'args', 'asctime', 'created', 'exc_info', 'exc_text', 'filename',
+    'funcName', 'levelname', 'levelno', 'lineno', 'module', 'msecs',
+    'message', 'msg', 'name', 'pathname', 'process', 'processName',
+    'relativeCreated', 'stack_info', 'taskName', 'thread', 'threadName'
+})
 
 
 # Custom JSON formatter for structured logging
 class StructuredLogFormatter(logging.Formatter):
     def format(self, record):
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": iso_utcnow(),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
         }
-        # Safely extract extra fields added via logger.info(msg, extra={...})
-        standard_attrs = {
-            'args', 'asctime', 'created', 'exc_info', 'exc_text', 'filename',
-            'funcName', 'levelname', 'levelno', 'lineno', 'module', 'msecs',
-            'message', 'msg', 'name', 'pathname', 'process', 'processName',
-            'relativeCreated', 'stack_info', 'thread', 'threadName', 'extra'
-        }
-        for key, value in record.__dict__.items():
-            if key not in standard_attrs and not key.startswith('_'):
-                log_data[key] = value
-        
+        # Extract extra fields added via logger.info(msg, extra={...});
+        # set difference in C instead of scanning every attribute in Python
+        for key in record.__dict__.keys() - _STANDARD_LOG_ATTRS:
+            if not key.startswith('_'):
+                log_data[key] = record.__dict__[key]
+
         return json.dumps(log_data)
 
 
-# Apply structured logging
-for handler in logging.root.handlers:
-    handler.setFormatter(StructuredLogFormatter())
+# Configure structured logging once, with the formatter pre-installed
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(StructuredLogFormatter())
+logging.basicConfig(level=logging.INFO, handlers=[_log_handler])
+logger = logging.getLogger(__name__)
 
 
 @asynccontextmanager
@@ -73,7 +76,12 @@ async def lifespan(app: FastAPI):
     logger.info("Starting Medical Clinic Booking System")
     logger.info(f"Daily discount quota: {settings.daily_discount_quota}")
     logger.info(f"Discount percentage: {settings.discount_percentage}%")
+    # Build both Redis clients before traffic so concurrent first requests
+    # can't race the lazy init and construct duplicate clients
+    await event_publisher.get_redis()
+    await event_publisher.get_redis_raw()
     if not settings.use_gcp_workflow:
+        from app.saga.choreography import saga_choreographer
         await saga_choreographer.start()
     else:
         logger.info("USE_GCP_WORKFLOW=true: in-app choreographer disabled; use GCP Workflow to process bookings")
@@ -86,7 +94,8 @@ app = FastAPI(
     title="Medical Clinic Booking System",
     description="Event-driven booking system with SAGA pattern",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -105,6 +114,16 @@ class ServicesResponse(BaseModel):
     services: list[MedicalService]
 
 
+# The service catalog only changes on deploy, so serialize the /services
+# responses once at import and serve the cached bytes per request.
+_SERVICES_JSON = {
+    gender: orjson.dumps(
+        ServicesResponse(gender=gender, services=get_services_by_gender(gender)).model_dump()
+    )
+    for gender in ("male", "female")
+}
+
+
 class QuotaStatus(BaseModel):
     date: str
     current_count: int
@@ -137,7 +156,7 @@ async def health_check():
     
     return HealthResponse(
         status="healthy" if redis_ok else "degraded",
-        timestamp=datetime.utcnow().isoformat(),
+        timestamp=iso_utcnow(),
         redis_connected=redis_ok
     )
 
@@ -145,13 +164,10 @@ async def health_check():
 @app.get("/services/{gender}", response_model=ServicesResponse)
 async def get_services(gender: str):
     """Get available services for a gender."""
-    try:
-        # Validate gender
-        gender_enum = Gender(gender.lower())
-        services = get_services_by_gender(gender_enum.value)
-        return ServicesResponse(gender=gender, services=services)
-    except ValueError:
+    payload = _SERVICES_JSON.get(gender.lower())
+    if payload is None:
         raise HTTPException(status_code=400, detail="Invalid gender. Use 'male' or 'female'")
+    return Response(content=payload, media_type="application/json")
 
 
 @app.post("/booking", response_model=BookingResponse)
@@ -174,9 +190,8 @@ async def create_booking(request: BookingRequest, background_tasks: BackgroundTa
         service_ids=request.service_ids
     )
     
-    # Save initial state and publish first event
-    await event_publisher.save_transaction_state(state)
-    await event_publisher.publish_event(EventType.BOOKING_INITIATED, state.request_id)
+    # Save initial state and publish first event in one round-trip
+    await event_publisher.save_and_publish(state, EventType.BOOKING_INITIATED)
     
     return BookingResponse(
         request_id=state.request_id,
@@ -215,52 +230,87 @@ async def get_booking_status(request_id: str):
 async def stream_booking_status(request_id: str):
     """
     Server-Sent Events stream for real-time status updates.
+
+    Subscribes to the per-request Pub/Sub channel published by
+    save_transaction_state, so the coroutine wakes only on real events
+    instead of polling Redis every 500ms per connected client.
     """
-    async def event_generator() -> AsyncGenerator[str, None]:
-        last_event_count = 0
-        max_wait = 60  # Maximum wait time in seconds
-        start_time = datetime.utcnow()
-        
-        while True:
+    # Only COMPLETED or COMPENSATED end the stream; QUOTA_EXHAUSTED is not
+    # terminal so choreography can run compensation and we show it.
+    terminal_statuses = (TransactionStatus.COMPLETED, TransactionStatus.COMPENSATED)
+    # Buffered *.started events are flushed in the same save as the terminal
+    # event, so several pub/sub messages can carry a terminal status. Only
+    # the terminal event itself ends the live stream — otherwise the
+    # booking.completed frame behind a booking.started one is never sent.
+    terminal_events = (EventType.BOOKING_COMPLETED.value, EventType.COMPENSATION_COMPLETED.value)
+
+    def format_update(status: TransactionStatus, event: dict) -> bytes:
+        update = StatusUpdate(
+            request_id=request_id,
+            status=status,
+            message=event.get("message", ""),
+            timestamp=datetime.fromisoformat(event.get("timestamp", iso_utcnow())),
+            details=event.get("details")
+        )
+        return b"data: " + msgspec.json.encode(update) + b"\n\n"
+
+    async def format_final_result() -> bytes:
+        from app.services.booking import booking_service
+        state = await event_publisher.get_transaction_state(request_id)
+        result = booking_service.build_result(state)
+        return b"data: " + orjson.dumps({"final_result": result.model_dump()}) + b"\n\n"
+
+    async def event_generator() -> AsyncGenerator[bytes, None]:
+        max_wait = 60.0  # Maximum wait time in seconds
+        r = await event_publisher.get_redis_raw()
+        pubsub = r.pubsub()
+        # Subscribe before the initial state read so no update can slip
+        # between replaying stored events and listening for new ones.
+        await pubsub.subscribe(f"{event_publisher.UPDATE_CHANNEL_PREFIX}{request_id}")
+        try:
             state = await event_publisher.get_transaction_state(request_id)
-            
             if not state:
-                yield f"data: {json.dumps({'error': 'Booking not found'})}\n\n"
-                break
-            
-            # Send new events
-            if len(state.events) > last_event_count:
-                for event in state.events[last_event_count:]:
-                    update = StatusUpdate(
-                        request_id=state.request_id,
-                        status=state.status,
-                        message=event.get("message", ""),
-                        timestamp=datetime.fromisoformat(event.get("timestamp", datetime.utcnow().isoformat())),
-                        details=event.get("details")
-                    )
-                    yield f"data: {update.model_dump_json()}\n\n"
-                last_event_count = len(state.events)
-            
-            # Check if terminal state (only COMPLETED or COMPENSATED end the stream;
-            # QUOTA_EXHAUSTED is not terminal so choreography can run compensation and we show it)
-            if state.status in [
-                TransactionStatus.COMPLETED,
-                TransactionStatus.COMPENSATED,
-            ]:
-                # Send final result
-                from app.services.booking import booking_service
-                result = booking_service.build_result(state)
-                yield f"data: {json.dumps({'final_result': result.model_dump()})}\n\n"
-                break
-            
-            # Timeout check
-            elapsed = (datetime.utcnow() - start_time).seconds
-            if elapsed > max_wait:
-                yield f"data: {json.dumps({'error': 'Timeout waiting for booking completion'})}\n\n"
-                break
-            
-            await asyncio.sleep(0.5)
-    
+                yield b'data: ' + orjson.dumps({"error": "Booking not found"}) + b'\n\n'
+                return
+
+            # Replay events that happened before the client connected
+            last_seq = len(state.events)
+            for event in state.events:
+                yield format_update(state.status, event)
+
+            if state.status in terminal_statuses:
+                yield await format_final_result()
+                return
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + max_wait
+            while True:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    yield b'data: ' + orjson.dumps({"error": "Timeout waiting for booking completion"}) + b'\n\n'
+                    return
+
+                message = await pubsub.get_message(
+                    ignore_subscribe_messages=True,
+                    timeout=timeout
+                )
+                if message is None:
+                    continue
+
+                payload = msgpack.unpackb(message["data"])
+                if payload["seq"] <= last_seq:
+                    continue  # Already replayed from stored state
+                last_seq = payload["seq"]
+
+                status = STATUS_BY_VALUE[payload["status"]]
+                yield format_update(status, payload["event"])
+
+                if status in terminal_statuses and payload["event"]["type"] in terminal_events:
+                    yield await format_final_result()
+                    return
+        finally:
+            await pubsub.aclose()
+
     return StreamingResponse(
         event_generator(),
         media_type="text/event-stream"
@@ -272,6 +322,7 @@ async def stream_booking_status(request_id: str):
 @app.get("/admin/quota", response_model=QuotaStatus)
 async def get_quota_status():
     """Get current quota status."""
+    from app.services.quota import quota_service
     current = await quota_service.get_current_quota_count()
     remaining = await quota_service.get_remaining_quota()
     
@@ -286,6 +337,7 @@ async def get_quota_status():
 @app.post("/admin/quota/reset")
 async def reset_quota():
     """Reset quota to 0 (testing only)."""
+    from app.services.quota import quota_service
     success = await quota_service.reset_quota()
     return {"success": success, "message": "Quota reset" if success else "Failed to reset quota"}
 
@@ -293,6 +345,7 @@ async def reset_quota():
 @app.post("/admin/quota/set/{count}")
 async def set_quota(count: int):
     """Set quota to specific value (testing only)."""
+    from app.services.quota import quota_service
     success = await quota_service.set_quota_count(count)
     return {"success": success, "count": count}
 
@@ -315,5 +368,20 @@ async def toggle_failure_simulation(request: SimulateFailureRequest):
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    # Multi-worker needs the import string, not the app instance. The stream
+    # consumer group already shards events across choreographer instances,
+    # but the per-request ordering locks live in process memory, so two
+    # workers can interleave steps of one saga. Keep the default at 1 worker
+    # until that ordering is enforced in Redis; then scale with
+    # WEB_CONCURRENCY (e.g. os.cpu_count()).
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8080,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        log_config=None
+    )
@@ -4,10 +4,14 @@ Pydantic schemas for the Medical Clinic Booking System.
 
 from datetime import date, datetime
 from enum import Enum
-from typing import List, Optional, Dict, Any
-from pydantic import BaseModel, Field, field_validator
+from typing import Annotated, List, Optional, Dict, Any, Set
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, StringConstraints, field_validator
+import msgpack
+import msgspec
 import uuid
 
+from app.utils import iso_utcnow, utcnow
+
 
 class Gender(str, Enum):
     """Gender enumeration."""
@@ -42,7 +46,7 @@ class EventType(str, Enum):
     PRICING_COMPLETED = "pricing.completed"
     QUOTA_CHECK_STARTED = "quota.check_started"
     QUOTA_RESERVED = "quota.reserved"
-    QUOTA_RESERVED_OVER_LIMIT = "quota.reserved_over_limit"  # display: reserve first, then check fails
+    QUOTA_RESERVED_OVER_LIMIT = "quota.reserved_over_limit"  # legacy: kept for stored event histories
     QUOTA_EXHAUSTED = "quota.exhausted"
     BOOKING_STARTED = "booking.started"
     BOOKING_COMPLETED = "booking.completed"
@@ -51,8 +55,16 @@ class EventType(str, Enum):
     COMPENSATION_COMPLETED = "compensation.completed"
 
 
+# Value→member maps: a plain dict lookup skips the enum __call__ machinery
+# on the per-read state reconstruction and SSE paths.
+GENDER_BY_VALUE: Dict[str, Gender] = Gender._value2member_map_
+STATUS_BY_VALUE: Dict[str, TransactionStatus] = TransactionStatus._value2member_map_
+
+
 class MedicalService(BaseModel):
-    """Medical service model."""
+    """Medical service model (frozen: catalog entries are shared singletons)."""
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
     price: float
@@ -61,7 +73,9 @@ class MedicalService(BaseModel):
 
 class UserInput(BaseModel):
     """User input data."""
-    name: str = Field(..., min_length=1, max_length=100)
+    # Strip + length constraints run in pydantic-core at the API boundary,
+    # so services never re-validate the name in Python
+    name: Annotated[str, StringConstraints(strip_whitespace=True, min_length=2, max_length=100)]
     gender: Gender
     date_of_birth: date
     
@@ -86,8 +100,8 @@ class BookingResponse(BaseModel):
     message: str
 
 
-class StatusUpdate(BaseModel):
-    """Real-time status update."""
+class StatusUpdate(msgspec.Struct):
+    """Real-time status update (internal only; msgspec for fast SSE encode)."""
     request_id: str
     status: TransactionStatus
     message: str
@@ -127,19 +141,96 @@ class TransactionState(BaseModel):
     reference_id: Optional[str] = None
     error_message: Optional[str] = None
     events: List[Dict[str, Any]] = []
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
-    
+    created_at: datetime = Field(default_factory=utcnow)
+    updated_at: datetime = Field(default_factory=utcnow)
+
+    # Dirty-field tracking so saves only write what changed (delta HSET),
+    # instead of re-serializing the whole model on every SAGA step.
+    _dirty_fields: Set[str] = PrivateAttr(default_factory=set)
+    _new_events: List[Dict[str, Any]] = PrivateAttr(default_factory=list)
+
+    def model_post_init(self, __context) -> None:
+        # A freshly constructed state must be written in full on first save.
+        self._dirty_fields.update(type(self).model_fields)
+        self._dirty_fields.discard("events")
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        if name in type(self).model_fields and name != "events":
+            private = self.__pydantic_private__
+            if private is not None and private.get("_dirty_fields") is not None:
+                private["_dirty_fields"].add(name)
+
     def add_event(self, event_type: EventType, message: str, details: Optional[Dict] = None):
         """Add event to audit trail."""
-        self.events.append({
+        event = {
             "type": event_type.value,
             "message": message,
             "details": details or {},
-            "timestamp": datetime.utcnow().isoformat()
-        })
-        self.updated_at = datetime.utcnow()
-    
+            "timestamp": iso_utcnow()
+        }
+        self.events.append(event)
+        self._new_events.append(event)
+        self.updated_at = utcnow()
+
+    def _dump_field(self, name: str) -> Any:
+        """Dump a single field to a msgpack-safe value without a full model_dump."""
+        value = getattr(self, name)
+        if isinstance(value, BaseModel):
+            return value.model_dump(mode="json")
+        if isinstance(value, list):
+            return [
+                v.model_dump(mode="json") if isinstance(v, BaseModel) else v
+                for v in value
+            ]
+        if isinstance(value, Enum):
+            return value.value
+        if isinstance(value, datetime):
+            return value.isoformat()
+        return value
+
+    def to_redis_hash(self) -> Dict[str, bytes]:
+        """Pack dirty fields (events excluded) for a delta HSET."""
+        return {
+            name: msgpack.packb(self._dump_field(name))
+            for name in self._dirty_fields
+        }
+
+    def pending_events(self) -> List[bytes]:
+        """Pack events added since the last save, for RPUSH to the events list."""
+        return [msgpack.packb(event) for event in self._new_events]
+
+    def pending_updates(self) -> List[bytes]:
+        """
+        Pack per-request pub/sub messages for events added since the last save.
+        Each carries a sequence number so SSE subscribers can dedupe against
+        events they already replayed from the stored state.
+        """
+        base_seq = len(self.events) - len(self._new_events)
+        status = self.status.value
+        return [
+            msgpack.packb({"seq": base_seq + i + 1, "status": status, "event": event})
+            for i, event in enumerate(self._new_events)
+        ]
+
+    def mark_saved(self) -> None:
+        """Clear dirty tracking after a successful save."""
+        self._dirty_fields.clear()
+        self._new_events.clear()
+
+    @classmethod
+    def from_redis_hash(
+        cls,
+        fields: Dict[bytes, bytes],
+        events: List[bytes]
+    ) -> "TransactionState":
+        """Create from Redis HASH fields + events list entries."""
+        data = {key.decode(): msgpack.unpackb(value) for key, value in fields.items()}
+        data["events"] = [msgpack.unpackb(event) for event in events]
+        state = cls.from_dict(data)
+        state.mark_saved()
+        return state
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for Redis storage."""
         data = self.model_dump()
@@ -150,19 +241,27 @@ class TransactionState(BaseModel):
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> "TransactionState":
-        """Create from dictionary (Redis retrieval)."""
-        if isinstance(data["user"]["date_of_birth"], str):
-            data["user"]["date_of_birth"] = date.fromisoformat(data["user"]["date_of_birth"])
+        """
+        Create from dictionary (Redis retrieval).
+
+        The data was serialized by this same service, so full pydantic
+        validation is wasted work on every read: nested models are rebuilt
+        with model_construct and enums resolved via precomputed value maps.
+        """
+        user = data["user"]
+        if isinstance(user["date_of_birth"], str):
+            user["date_of_birth"] = date.fromisoformat(user["date_of_birth"])
+        if isinstance(user["gender"], str):
+            user["gender"] = GENDER_BY_VALUE[user["gender"]]
+        data["user"] = UserInput.model_construct(**user)
+        if isinstance(data["status"], str):
+            data["status"] = STATUS_BY_VALUE[data["status"]]
+        data["services"] = [
+            MedicalService.model_construct(**s) if isinstance(s, dict) else s
+            for s in data.get("services", [])
+        ]
         if isinstance(data["created_at"], str):
             data["created_at"] = datetime.fromisoformat(data["created_at"])
         if isinstance(data["updated_at"], str):
             data["updated_at"] = datetime.fromisoformat(data["updated_at"])
-        return cls(**data)
-
-
-class EventPayload(BaseModel):
-    """Event message payload."""
-    event_type: EventType
-    request_id: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
-    data: Dict[str, Any] = {}
+        return cls.model_construct(**data)
@@ -3,10 +3,13 @@ SAGA Choreography implementation using Redis Streams.
 """
 
 import logging
-import json
 import asyncio
+import random
+import socket
 from typing import Dict, Any
 
+from redis.exceptions import ConnectionError as RedisConnectionError, ResponseError
+
 from app.models.schemas import TransactionState, TransactionStatus, EventType
 from app.events.publisher import event_publisher
 from app.services.validation import validation_service
@@ -23,93 +26,207 @@ class SagaChoreographer:
     Listens to events on the Redis Stream and triggers the next step.
     """
     
+    GROUP_NAME = "saga-choreographers"
+
     def __init__(self):
         self.is_running = False
-        self._last_id = "0"
-    
+        # Stable across restarts (container hostname) so the startup read
+        # from '0' re-delivers messages this consumer left pending before a
+        # crash; a random name would register a fresh consumer with an empty
+        # pending list and orphan them in the group PEL.
+        self._consumer_name = f"choreographer-{socket.gethostname()}"
+        self._redis = None  # Bound once in start(); rebound on connection errors
+        # Per-request locks (with refcounts) keep steps of one saga ordered
+        # while different sagas run concurrently
+        self._locks: Dict[str, list] = {}
+        # Dispatch table keyed by raw event-type string (stream fields are
+        # strings): one dict lookup instead of an if/elif scan per event.
+        self._handlers = {
+            EventType.BOOKING_INITIATED.value: self._on_initiated,
+            EventType.VALIDATION_COMPLETED.value: self._on_validated,
+            EventType.PRICING_COMPLETED.value: self._on_priced,
+            EventType.QUOTA_RESERVED.value: self._on_quota_reserved,
+            EventType.VALIDATION_FAILED.value: self._on_failed,
+            EventType.QUOTA_EXHAUSTED.value: self._on_failed,
+            EventType.BOOKING_FAILED.value: self._on_failed,
+        }
+
     async def start(self):
         """Start the event listener loop."""
         if self.is_running:
             return
-        
-        # We use '$' to get ONLY new events arriving from this point forward.
-        # This prevents the choreographer from "replaying" old events on restart.
-        self._last_id = "$"
+
+        # Consumer group gives at-least-once delivery and lets N workers
+        # split the stream. Created at '$' so a fresh deploy does not replay
+        # the whole history; BUSYGROUP means it already exists.
+        self._redis = await event_publisher.get_redis()
+        try:
+            await self._redis.xgroup_create(
+                event_publisher.STREAM_NAME, self.GROUP_NAME, id="$", mkstream=True
+            )
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
         self.is_running = True
-        logger.info(f"SAGA Choreographer starting listener on stream: {event_publisher.STREAM_NAME}")
+        logger.info(
+            f"SAGA Choreographer '{self._consumer_name}' starting listener "
+            f"on stream: {event_publisher.STREAM_NAME}"
+        )
         asyncio.create_task(self._listen_for_events())
 
+    async def _claim_stale_messages(self, r):
+        """
+        Claim and dispatch messages left pending by consumers that never
+        came back (e.g. a replaced replica whose hostname is gone). The
+        '0' drain in the main loop only covers this consumer's own PEL.
+        """
+        start_id = "0-0"
+        while True:
+            reply = await r.xautoclaim(
+                event_publisher.STREAM_NAME,
+                self.GROUP_NAME,
+                self._consumer_name,
+                min_idle_time=60_000,
+                start_id=start_id,
+                count=100
+            )
+            start_id, messages = reply[0], reply[1]
+            if messages:
+                logger.warning(f"Claimed {len(messages)} stale pending message(s)")
+                await self._dispatch_batch(r, messages)
+            if start_id == "0-0":
+                return
+
+    async def _dispatch_batch(self, r, messages):
+        """Dispatch a batch of messages concurrently, logging any failures."""
+        results = await asyncio.gather(
+            *(self._dispatch(r, message_id, data)
+              for message_id, data in messages),
+            return_exceptions=True
+        )
+        # A failed dispatch is not acked, so it stays pending and is
+        # re-delivered by the '0' drain / claim pass after restart — but it
+        # must never vanish silently.
+        for (message_id, _), result in zip(messages, results):
+            if isinstance(result, BaseException):
+                logger.error(
+                    f"Choreography dispatch failed for {message_id}: {result!r}"
+                )
+
     async def _listen_for_events(self):
-        """Listen for new events on the Redis Stream."""
+        """Listen for new events on the Redis Stream via the consumer group."""
+        # Recover other consumers' abandoned messages, then read from '0' to
+        # re-process messages that were delivered to this consumer but never
+        # acknowledged (crash recovery), then tail with '>' for new messages.
+        try:
+            await self._claim_stale_messages(self._redis)
+        except Exception as e:
+            # Recovery is best-effort; never block the live tail on it
+            logger.error(f"Stale message claim failed: {str(e)}")
+        read_id = "0"
+        # Exponential backoff with jitter on errors, so multiple
+        # choreographer instances don't retry a recovering Redis in lockstep
+        backoff = 0.1
         while self.is_running:
             try:
-                r = await event_publisher.get_redis()
-                # Read new messages from the stream
-                # Use '$' on the first call to only get NEW events, then use the last message ID
-                current_id = self._last_id
-                events = await r.xread({event_publisher.STREAM_NAME: current_id}, count=5, block=2000)
-                
-                if not events:
+                r = self._redis
+                events = await r.xreadgroup(
+                    self.GROUP_NAME,
+                    self._consumer_name,
+                    {event_publisher.STREAM_NAME: read_id},
+                    # Large batches are free for these tiny entries and cut
+                    # wake-ups; concurrent dispatch fans the batch out anyway
+                    count=256,
+                    block=5000
+                )
+
+                backoff = 0.1
+
+                if not events or not events[0][1]:
+                    read_id = ">"
                     continue
 
+                # Dispatch concurrently: one slow step must not stall every
+                # other in-flight saga. Per-request locks keep ordering.
                 for stream_name, messages in events:
-                    for message_id, data in messages:
-                        self._last_id = message_id
-                        event_type = data.get("event_type")
-                        request_id = data.get("request_id")
-                        
-                        if event_type and request_id:
-                            logger.info(f"Choreography: Reacting to '{event_type}' for {request_id}")
-                            await self.handle_event(event_type, request_id)
-                        
+                    await self._dispatch_batch(r, messages)
+
             except Exception as e:
                 logger.error(f"Error in Choreography loop: {str(e)}")
-                await asyncio.sleep(1)
+                if isinstance(e, RedisConnectionError):
+                    self._redis = await event_publisher.get_redis()
+                await asyncio.sleep(min(backoff, 10.0) + random.random() * 0.1)
+                backoff *= 2
+
+    async def _dispatch(self, r, message_id: str, data: Dict[str, str]):
+        """Handle one stream message under its request's lock, then ack."""
+        event_type = data.get("t")
+        request_id = data.get("r")
+
+        if event_type and request_id:
+            entry = self._locks.setdefault(request_id, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    logger.info(f"Choreography: Reacting to '{event_type}' for {request_id}")
+                    await self.handle_event(event_type, request_id)
+            finally:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._locks.pop(request_id, None)
+
+        # Ack only after the step ran, so a crash re-delivers
+        await r.xack(event_publisher.STREAM_NAME, self.GROUP_NAME, message_id)
 
     async def handle_event(self, event_type: str, request_id: str):
         """Route event to the next service in the chain."""
+        handler = self._handlers.get(event_type)
+        if handler is None:
+            # Informational event (e.g. *.started): nothing to route, so
+            # skip the state fetch entirely.
+            return
+
         state = await event_publisher.get_transaction_state(request_id)
         if not state:
             return
 
         try:
-            # Choreography routing table
-            if event_type == EventType.BOOKING_INITIATED:
-                # 1. Initiated -> Start Validation
-                await validation_service.validate(state)
-
-            elif event_type == EventType.VALIDATION_COMPLETED:
-                # 2. Validated -> Start Pricing
-                await pricing_service.calculate_price(state)
-
-            elif event_type == EventType.PRICING_COMPLETED:
-                # 3. Priced -> Check Quota (if R1) or Go to Booking
-                if state.r1_eligible:
-                    await quota_service.try_reserve_quota(state)
-                else:
-                    # Skip R2 check, manually publish skip event
-                    await event_publisher.publish_event(
-                        EventType.QUOTA_RESERVED, 
-                        request_id, 
-                        {"skipped": True, "reason": "Not R1 eligible"}
-                    )
-
-            elif event_type == EventType.QUOTA_RESERVED:
-                # 4. Quota Reserved -> Finalize Booking
-                await booking_service.create_booking(state)
-
-            elif event_type in [EventType.BOOKING_FAILED, EventType.QUOTA_EXHAUSTED, EventType.VALIDATION_FAILED]:
-                # 5. Any critical failure -> Trigger Compensation
-                if event_type != EventType.BOOKING_FAILED: # Booking failure handled separately in booking service
-                     await self._handle_failure(state, state.error_message or "Process failed")
-                else:
-                    # If booking fails, trigger compensation immediately
-                    await self._handle_failure(state, state.error_message or "Booking failed")
-
+            await handler(state)
         except Exception as e:
             logger.error(f"SAGA Choreography error for {request_id}: {str(e)}")
             await self._handle_failure(state, str(e))
 
+    # Choreography routing table handlers
+
+    async def _on_initiated(self, state: TransactionState):
+        # 1. Initiated -> Start Validation
+        await validation_service.validate(state)
+
+    async def _on_validated(self, state: TransactionState):
+        # 2. Validated -> Start Pricing
+        await pricing_service.calculate_price(state)
+
+    async def _on_priced(self, state: TransactionState):
+        # 3. Priced -> Check Quota (if R1) or Go to Booking
+        if state.r1_eligible:
+            await quota_service.try_reserve_quota(state)
+        else:
+            # Skip R2 check, manually publish skip event
+            await event_publisher.publish_event(
+                EventType.QUOTA_RESERVED,
+                state.request_id,
+                {"skipped": True, "reason": "Not R1 eligible"}
+            )
+
+    async def _on_quota_reserved(self, state: TransactionState):
+        # 4. Quota Reserved -> Finalize Booking
+        await booking_service.create_booking(state)
+
+    async def _on_failed(self, state: TransactionState):
+        # 5. Any critical failure -> Trigger Compensation
+        await self._handle_failure(state, state.error_message or "Process failed")
+
     async def _handle_failure(self, state: TransactionState, error_message: str):
         """Handle failure and trigger compensation."""
         # Update state with failure info
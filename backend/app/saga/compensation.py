@@ -29,6 +29,16 @@ class CompensationHandler:
         Returns:
             True if compensation completed successfully
         """
+        # Idempotency guard: under at-least-once stream delivery a failure
+        # event can be redelivered, and compensating twice would release the
+        # quota slot twice. SET NX marks the first run; later runs no-op.
+        r = await event_publisher.get_redis()
+        marker_key = f"saga:compensated:{state.request_id}"
+        first_run = await r.set(marker_key, "1", nx=True, ex=86400)
+        if not first_run:
+            logger.info(f"Compensation already executed, skipping: {state.request_id}")
+            return True
+
         logger.info(
             f"Starting compensation: {state.request_id}",
             extra={
@@ -43,12 +53,7 @@ class CompensationHandler:
             EventType.COMPENSATION_STARTED,
             "Starting compensation for failed transaction"
         )
-        await event_publisher.save_transaction_state(state)
-        
-        await event_publisher.publish_event(
-            EventType.COMPENSATION_STARTED,
-            state.request_id
-        )
+        await event_publisher.save_and_publish(state, EventType.COMPENSATION_STARTED)
         
         compensation_actions = []
         success = True
@@ -75,11 +80,9 @@ class CompensationHandler:
                 f"Compensation completed. Actions: {', '.join(compensation_actions) or 'None required'}",
                 {"actions": compensation_actions}
             )
-            await event_publisher.save_transaction_state(state)
-            
-            await event_publisher.publish_event(
+            await event_publisher.save_and_publish(
+                state,
                 EventType.COMPENSATION_COMPLETED,
-                state.request_id,
                 {"actions": compensation_actions}
             )
             
@@ -87,14 +90,20 @@ class CompensationHandler:
                 f"Compensation completed: {state.request_id}",
                 extra={"actions": compensation_actions}
             )
-            
+
+            if not success:
+                # The marker only guards successful runs; clear it so a
+                # redelivered failure event can retry the release instead of
+                # leaving the slot reserved for the rest of the day.
+                await r.delete(marker_key)
             return success
-            
+
         except Exception as e:
             logger.error(
                 f"Compensation error: {state.request_id}",
                 extra={"error": str(e)}
             )
+            await r.delete(marker_key)
             state.add_event(
                 EventType.COMPENSATION_COMPLETED,
                 f"Compensation error: {str(e)}"
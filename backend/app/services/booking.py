@@ -4,7 +4,7 @@ Creates final booking records.
 """
 
 import logging
-import random
+import os
 import string
 from datetime import datetime
 from typing import Tuple
@@ -20,15 +20,32 @@ from app.events.publisher import event_publisher
 
 logger = logging.getLogger(__name__)
 
+# Compact YYYYMMDD for reference IDs, memoized against the dashed date so
+# the replace() runs once per day instead of once per booking.
+_compact_date_cache = ("", "")
+
+_REFERENCE_ALPHABET = (string.ascii_uppercase + string.digits).encode()
+
+
+def _compact_today_ist() -> str:
+    global _compact_date_cache
+    today = settings.get_today_ist()
+    if _compact_date_cache[0] != today:
+        _compact_date_cache = (today, today.replace("-", ""))
+    return _compact_date_cache[1]
+
 
 class BookingService:
     """Creates and manages bookings."""
     
     def _generate_reference_id(self) -> str:
         """Generate a unique booking reference ID."""
-        today = settings.get_today_ist().replace("-", "")
-        random_part = ''.join(random.choices(string.ascii_uppercase + string.digits, k=4))
-        return f"BK-{today}-{random_part}"
+        # os.urandom + table lookup avoids the per-call list allocations of
+        # random.choices; slight modulo bias is fine for a display-only ID.
+        random_part = bytes(
+            _REFERENCE_ALPHABET[b % 36] for b in os.urandom(4)
+        ).decode("ascii")
+        return f"BK-{_compact_today_ist()}-{random_part}"
     
     async def create_booking(self, state: TransactionState) -> Tuple[bool, str]:
         """
@@ -47,16 +64,12 @@ class BookingService:
         
         # Update status
         state.status = TransactionStatus.BOOKING
+        # Logged in memory only; flushed together with the terminal
+        # COMPLETED/FAILED event in one pipelined save below.
         state.add_event(
             EventType.BOOKING_STARTED,
             "Creating booking record"
         )
-        await event_publisher.save_transaction_state(state)
-        
-        await event_publisher.publish_event(
-            EventType.BOOKING_STARTED,
-            state.request_id
-        )
         
         try:
             # Check if failure simulation is enabled (for testing)
@@ -78,11 +91,9 @@ class BookingService:
                     "discount_applied": state.discount_applied
                 }
             )
-            await event_publisher.save_transaction_state(state)
-            
-            await event_publisher.publish_event(
+            await event_publisher.save_and_publish(
+                state,
                 EventType.BOOKING_COMPLETED,
-                state.request_id,
                 {"reference_id": reference_id}
             )
             
@@ -104,11 +115,9 @@ class BookingService:
                 EventType.BOOKING_FAILED,
                 error_msg
             )
-            await event_publisher.save_transaction_state(state)
-            
-            await event_publisher.publish_event(
+            await event_publisher.save_and_publish(
+                state,
                 EventType.BOOKING_FAILED,
-                state.request_id,
                 {"error": str(e)}
             )
             
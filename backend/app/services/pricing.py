@@ -19,14 +19,22 @@ from app.events.publisher import event_publisher
 
 logger = logging.getLogger(__name__)
 
+# Hoisted from the per-call path: the threshold and enum member never change
+# at runtime, so skip the settings/enum attribute lookups on every pricing.
+_FEMALE = Gender.FEMALE
+
 
 class PricingService:
     """Calculates pricing and discount eligibility."""
-    
+
+    def __init__(self):
+        self._threshold = settings.high_value_threshold
+
     def _is_birthday_today(self, dob: date) -> bool:
         """Check if today is the user's birthday (IST)."""
         today = settings.get_current_time_ist().date()
-        return dob.month == today.month and dob.day == today.day
+        # Pack (month, day) into one int so the comparison is a single op
+        return (dob.month << 5) | dob.day == (today.month << 5) | today.day
     
     def _calculate_r1_eligibility(
         self,
@@ -44,14 +52,10 @@ class PricingService:
         Returns:
             Tuple of (is_eligible, reason)
         """
-        is_birthday = self._is_birthday_today(dob)
-        is_female = gender == Gender.FEMALE
-        is_high_value = base_price > settings.high_value_threshold
-        
-        if is_female and is_birthday:
+        if gender is _FEMALE and self._is_birthday_today(dob):
             return True, "Birthday discount (Female)"
-        elif is_high_value:
-            return True, f"High-value order (>₹{settings.high_value_threshold})"
+        if base_price > self._threshold:
+            return True, f"High-value order (>₹{self._threshold})"
         
         return False, ""
     
@@ -69,16 +73,12 @@ class PricingService:
         
         # Update status
         state.status = TransactionStatus.PRICING
+        # Recorded in the event log but not flushed yet: pricing is pure CPU,
+        # so both STARTED and COMPLETED are persisted in the single save below.
         state.add_event(
             EventType.PRICING_STARTED,
             "Starting price calculation"
         )
-        await event_publisher.save_transaction_state(state)
-        
-        await event_publisher.publish_event(
-            EventType.PRICING_STARTED,
-            state.request_id
-        )
         
         try:
             # Calculate base price
@@ -121,11 +121,9 @@ class PricingService:
                     "discount_reason": discount_reason
                 }
             )
-            await event_publisher.save_transaction_state(state)
-            
-            await event_publisher.publish_event(
+            await event_publisher.save_and_publish(
+                state,
                 EventType.PRICING_COMPLETED,
-                state.request_id,
                 {
                     "base_price": base_price,
                     "r1_eligible": is_r1_eligible
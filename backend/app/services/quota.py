@@ -17,31 +17,66 @@ from app.events.publisher import event_publisher
 
 logger = logging.getLogger(__name__)
 
+# Today's quota key, memoized against the IST date string so the hot path
+# skips the f-string rebuild (get_today_ist itself is already TTL-cached).
+_quota_key_cache = ("", "")
+
 
 class QuotaService:
     """Manages daily discount quota (R2 rule)."""
     
     QUOTA_KEY_PREFIX = "quota_v2:discount:"
-    
+
+    # Atomic check-and-reserve in one round-trip: increments only while
+    # under the limit, so an over-limit request never commits a slot that a
+    # compensating DECR has to undo (and never shows other bookings a
+    # transient over-count). Returns {granted, count}; applies the
+    # until-midnight expiry on the first reservation of the day.
+    RESERVE_SCRIPT = """
+    local count = tonumber(redis.call('GET', KEYS[1]) or '0')
+    if count >= tonumber(ARGV[2]) then
+        return {0, count}
+    end
+    count = redis.call('INCR', KEYS[1])
+    if count == 1 then
+        redis.call('EXPIRE', KEYS[1], ARGV[1])
+    end
+    return {1, count}
+    """
+
+    # Atomic, floor-at-zero release. Server-side Lua replaces the Python
+    # DECR + conditional SET (two RTTs and a race window) with one RTT that
+    # cannot drive the counter negative.
+    RELEASE_SCRIPT = """
+    local count = redis.call('DECR', KEYS[1])
+    if count < 0 then
+        redis.call('SET', KEYS[1], 0)
+        return 0
+    end
+    return count
+    """
+
     def __init__(self):
         self._redis = None
+        self._reserve_script = None
+        self._release_script = None
     
     async def get_redis(self) -> redis.Redis:
-        """Get or create Redis connection."""
+        """Get the shared Redis connection."""
+        # Share the publisher's binary client: quota replies are ints (INCR,
+        # Lua) or digit strings that int() accepts as bytes, so paying the
+        # UTF-8 decode of decode_responses buys nothing here.
         if self._redis is None:
-            self._redis = redis.Redis(
-                host=settings.redis_host,
-                port=settings.redis_port,
-                username=settings.redis_username,
-                password=settings.redis_password,
-                decode_responses=True
-            )
+            self._redis = await event_publisher.get_redis_raw()
         return self._redis
     
     def _get_quota_key(self) -> str:
         """Get today's quota key (IST date)."""
+        global _quota_key_cache
         today = settings.get_today_ist()
-        return f"{self.QUOTA_KEY_PREFIX}{today}"
+        if _quota_key_cache[0] != today:
+            _quota_key_cache = (today, f"{self.QUOTA_KEY_PREFIX}{today}")
+        return _quota_key_cache[1]
     
     async def get_current_quota_count(self) -> int:
         """Get current discount count for today."""
@@ -72,49 +107,48 @@ class QuotaService:
             logger.info(f"Skipping quota check (not R1 eligible): {state.request_id}")
             return True, "Quota check skipped (not eligible for discount)"
         
-        # Update status
+        # Update status. The STARTED event is buffered and persisted with
+        # the RESERVED/EXHAUSTED outcome in one save; nothing routes on it.
         state.status = TransactionStatus.CHECKING_QUOTA
         state.add_event(
             EventType.QUOTA_CHECK_STARTED,
             "Checking daily discount quota availability"
         )
-        await event_publisher.save_transaction_state(state)
-        
-        await event_publisher.publish_event(
-            EventType.QUOTA_CHECK_STARTED,
-            state.request_id
-        )
         
         try:
             r = await self.get_redis()
             quota_key = self._get_quota_key()
+
+            # register_script handles EVALSHA caching and NOSCRIPT fallback
+            if self._reserve_script is None:
+                self._reserve_script = r.register_script(self.RESERVE_SCRIPT)
+            granted, new_count = await self._reserve_script(
+                keys=[quota_key],
+                args=[
+                    settings.get_seconds_until_midnight_ist(),
+                    settings.daily_discount_quota
+                ]
+            )
             
-            # Atomic increment
-            new_count = await r.incr(quota_key)
-            
-            # Set expiry if this is a new key (first discount of the day)
-            ttl = await r.ttl(quota_key)
-            if ttl == -1:  # No expiry set
-                seconds_until_midnight = settings.get_seconds_until_midnight_ist()
-                await r.expire(quota_key, seconds_until_midnight)
-            
-            if new_count <= settings.daily_discount_quota:
+            if granted:
                 # Quota available
                 state.quota_reserved = True
                 state.quota_key = quota_key
                 state.discount_applied = True
-                state.final_price = state.base_price * (1 - state.discount_percentage / 100)
+                # Discount in integer paise so 12% of ₹1200 is exactly
+                # ₹1056.00 rather than a floating-point neighbour
+                base_paise = round(state.base_price * 100)
+                discount_bp = round(state.discount_percentage * 100)
+                state.final_price = base_paise * (10000 - discount_bp) // 10000 / 100
                 state.status = TransactionStatus.QUOTA_RESERVED
                 state.add_event(
                     EventType.QUOTA_RESERVED,
                     f"Discount quota reserved. Slot {new_count}/{settings.daily_discount_quota}",
                     {"slot": new_count, "max": settings.daily_discount_quota}
                 )
-                await event_publisher.save_transaction_state(state)
-                
-                await event_publisher.publish_event(
+                await event_publisher.save_and_publish(
+                    state,
                     EventType.QUOTA_RESERVED,
-                    state.request_id,
                     {"slot": new_count}
                 )
                 
@@ -125,32 +159,21 @@ class QuotaService:
                 
                 return True, f"Quota reserved (slot {new_count}/{settings.daily_discount_quota})"
             else:
-                # Flow: 1) Reserve first (INCR committed), 2) Check fails (over limit), 3) Revert (compensation DECR)
-                state.quota_reserved = True
-                state.quota_key = quota_key
+                # The script rejected without committing, so there is no
+                # reserved slot to revert: compensation for this path only
+                # finalizes the transaction state.
                 state.status = TransactionStatus.QUOTA_EXHAUSTED
                 state.error_message = "Daily discount quota reached. Please try again tomorrow."
-                # Event 1: Reserve first (commit) — so terminal shows "first reserved"
-                state.add_event(
-                    EventType.QUOTA_RESERVED_OVER_LIMIT,
-                    f"Quota slot reserved (over limit: {new_count}/{settings.daily_discount_quota}); check will fail",
-                    {"current_count": new_count, "max": settings.daily_discount_quota}
-                )
-                # Event 2: Check failed — then compensation will revert
                 state.add_event(
                     EventType.QUOTA_EXHAUSTED,
-                    "Daily discount quota exceeded. Compensation will release reserved slot.",
+                    "Daily discount quota exceeded. No slot was reserved.",
                     {"current_count": new_count, "max": settings.daily_discount_quota}
                 )
-                await event_publisher.save_transaction_state(state)
-                # Only publish QUOTA_EXHAUSTED so choreography triggers compensation (not booking)
-                await event_publisher.publish_event(
-                    EventType.QUOTA_EXHAUSTED,
-                    state.request_id
-                )
+                # Publish QUOTA_EXHAUSTED so choreography triggers compensation (not booking)
+                await event_publisher.save_and_publish(state, EventType.QUOTA_EXHAUSTED)
                 
                 logger.warning(
-                    f"Quota exceeded: {state.request_id} (compensation will release reserved slot)",
+                    f"Quota exceeded: {state.request_id}",
                     extra={"current_count": new_count}
                 )
                 
@@ -177,22 +200,26 @@ class QuotaService:
             True if quota was released successfully
         """
         logger.info(f"Releasing quota for: {state.request_id}")
-        
+
+        # Only undo a slot this booking actually committed. The exhausted
+        # path rejects without reserving, so an unguarded DECR would release
+        # a slot held by another booking.
+        if not state.quota_reserved:
+            logger.info(f"No quota reserved, nothing to release: {state.request_id}")
+            return True
+
         try:
             r = await self.get_redis()
             # Use the key stored in state, fallback to today's key if missing
             quota_key = state.quota_key or self._get_quota_key()
-            
-            # Decrement quota
-            new_count = await r.decr(quota_key)
-            
-            # Ensure count doesn't go below 0
-            if new_count < 0:
-                await r.set(quota_key, 0)
-            
+
+            if self._release_script is None:
+                self._release_script = r.register_script(self.RELEASE_SCRIPT)
+            new_count = await self._release_script(keys=[quota_key])
+
             logger.info(
                 f"Quota released: {state.request_id}",
-                extra={"new_count": max(0, new_count)}
+                extra={"new_count": new_count}
             )
             
             return True
@@ -221,9 +248,8 @@ class QuotaService:
         try:
             r = await self.get_redis()
             quota_key = self._get_quota_key()
-            await r.set(quota_key, count)
             seconds_until_midnight = settings.get_seconds_until_midnight_ist()
-            await r.expire(quota_key, seconds_until_midnight)
+            await r.set(quota_key, count, ex=seconds_until_midnight)
             logger.info(f"Quota set to {count}")
             return True
         except Exception as e:
@@ -36,28 +36,18 @@ class ValidationService:
         
         # Update status to validating
         state.status = TransactionStatus.VALIDATING
+        # Buffered in the event log only; validation is in-process CPU work,
+        # so STARTED is persisted together with the COMPLETED/FAILED event in
+        # the single pipelined save below.
         state.add_event(
             EventType.VALIDATION_STARTED,
             "Starting validation of user input and services"
         )
-        await event_publisher.save_transaction_state(state)
-        
-        # Publish event
-        await event_publisher.publish_event(
-            EventType.VALIDATION_STARTED,
-            state.request_id,
-            {"user_name": state.user.name}
-        )
         
         try:
-            # Validate user name
-            if not state.user.name or len(state.user.name.strip()) < 2:
-                raise ValueError("Name must be at least 2 characters long")
-            
-            # Validate service selections
-            if not state.service_ids:
-                raise ValueError("At least one service must be selected")
-            
+            # Name length/whitespace and the non-empty service list are
+            # enforced by the pydantic schema at the API boundary, so only
+            # the catalog lookup can still fail here.
             # Get and validate services
             services = get_services_by_ids(
                 state.service_ids,
@@ -72,12 +62,9 @@ class ValidationService:
                 f"Validation successful. {len(services)} services selected.",
                 {"services": [s.name for s in services]}
             )
-            await event_publisher.save_transaction_state(state)
-            
-            # Publish success event
-            await event_publisher.publish_event(
+            await event_publisher.save_and_publish(
+                state,
                 EventType.VALIDATION_COMPLETED,
-                state.request_id,
                 {"service_count": len(services)}
             )
             
@@ -96,12 +83,9 @@ class ValidationService:
                 EventType.VALIDATION_FAILED,
                 f"Validation failed: {error_msg}"
             )
-            await event_publisher.save_transaction_state(state)
-            
-            # Publish failure event
-            await event_publisher.publish_event(
+            await event_publisher.save_and_publish(
+                state,
                 EventType.VALIDATION_FAILED,
-                state.request_id,
                 {"error": error_msg}
             )
             
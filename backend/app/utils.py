@@ -0,0 +1,29 @@
+"""
+Small shared helpers for hot code paths.
+"""
+
+import time
+from datetime import datetime, timezone
+
+
+def utcnow() -> datetime:
+    """Timezone-aware UTC now (datetime.utcnow is deprecated in 3.12)."""
+    return datetime.now(timezone.utc)
+
+
+_last_ts = (0, "")
+
+
+def iso_utcnow() -> str:
+    """
+    UTC timestamp in ISO format, memoized at 1-second resolution.
+
+    Formatting a UTC timestamp is done several times per SAGA step
+    (events, stream entries, log records); within the same second this
+    returns the cached string instead of reformatting.
+    """
+    global _last_ts
+    t = int(time.time())
+    if t != _last_ts[0]:
+        _last_ts = (t, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(t)))
+    return _last_ts[1]
@@ -3,32 +3,67 @@ API client for the Medical Clinic Booking System CLI.
 """
 
 import httpx
+import orjson
 from typing import Optional, Dict, Any, AsyncGenerator
 from datetime import date
-import json
 
 
 class BookingAPIClient:
     """HTTP client for interacting with the booking backend."""
-    
+
     def __init__(self, base_url: str = "http://localhost:8080"):
         self.base_url = base_url.rstrip("/")
         self.timeout = httpx.Timeout(30.0, connect=10.0)
-    
+        # One shared client so polling/streaming reuse keepalive connections
+        # instead of paying a TCP connect per call; created lazily so it is
+        # always bound to the running event loop.
+        self._client: Optional[httpx.AsyncClient] = None
+        # The service catalog only changes on backend deploy, so cache it
+        # per gender for the lifetime of the CLI session
+        self._services_cache: Dict[str, Dict[str, Any]] = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_keepalive_connections=20,
+                    max_connections=100,
+                    keepalive_expiry=30.0
+                )
+            )
+        return self._client
+
+    async def aclose(self) -> None:
+        """Close the underlying connection pool."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "BookingAPIClient":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
     async def health_check(self) -> Dict[str, Any]:
         """Check backend health."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(f"{self.base_url}/health")
-            response.raise_for_status()
-            return response.json()
-    
+        response = await self._get_client().get("/health")
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
     async def get_services(self, gender: str) -> Dict[str, Any]:
-        """Get available services for a gender."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(f"{self.base_url}/services/{gender}")
-            response.raise_for_status()
-            return response.json()
-    
+        """Get available services for a gender (cached per session)."""
+        cached = self._services_cache.get(gender)
+        if cached is not None:
+            return cached
+        response = await self._get_client().get(f"/services/{gender}")
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        self._services_cache[gender] = data
+        return data
+
     async def create_booking(
         self,
         name: str,
@@ -45,72 +80,76 @@ class BookingAPIClient:
             },
             "service_ids": service_ids
         }
-        
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/booking",
-                json=payload
-            )
-            response.raise_for_status()
-            return response.json()
-    
+
+        # orjson serializes the payload (dates included) without httpx's
+        # stdlib-json encode step
+        response = await self._get_client().post(
+            "/booking",
+            content=orjson.dumps(payload),
+            headers={"content-type": "application/json"}
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
     async def get_booking_result(self, request_id: str) -> Dict[str, Any]:
         """Get the final booking result."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(f"{self.base_url}/booking/{request_id}/result")
-            response.raise_for_status()
-            return response.json()
-    
+        response = await self._get_client().get(f"/booking/{request_id}/result")
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
     async def get_booking_status(self, request_id: str) -> Dict[str, Any]:
         """Get current booking status with events."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(f"{self.base_url}/booking/{request_id}/status")
-            response.raise_for_status()
-            return response.json()
-    
+        response = await self._get_client().get(f"/booking/{request_id}/status")
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
     async def stream_booking_status(self, request_id: str) -> AsyncGenerator[Dict[str, Any], None]:
         """Stream real-time booking status updates via SSE."""
-        async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
-            async with client.stream(
-                "GET",
-                f"{self.base_url}/booking/{request_id}/stream"
-            ) as response:
-                async for line in response.aiter_lines():
-                    if line.startswith("data: "):
-                        data = line[6:]  # Remove "data: " prefix
-                        try:
-                            yield json.loads(data)
-                        except json.JSONDecodeError:
-                            continue
-    
+        async with self._get_client().stream(
+            "GET",
+            f"/booking/{request_id}/stream",
+            timeout=httpx.Timeout(60.0)
+        ) as response:
+            # Split SSE frames on the raw byte stream instead of
+            # aiter_lines(): one decode per payload, no per-line str work.
+            buf = bytearray()
+            async for chunk in response.aiter_bytes():
+                buf += chunk
+                while (idx := buf.find(b"\n\n")) != -1:
+                    frame = bytes(buf[:idx])
+                    del buf[:idx + 2]
+                    for line in frame.split(b"\n"):
+                        if line.startswith(b"data: "):
+                            try:
+                                yield orjson.loads(line[6:])
+                            except orjson.JSONDecodeError:
+                                continue
+
     async def get_quota_status(self) -> Dict[str, Any]:
         """Get current quota status (admin)."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.get(f"{self.base_url}/admin/quota")
-            response.raise_for_status()
-            return response.json()
-    
+        response = await self._get_client().get("/admin/quota")
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
     async def reset_quota(self) -> Dict[str, Any]:
         """Reset quota to 0 (admin)."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(f"{self.base_url}/admin/quota/reset")
-            response.raise_for_status()
-            return response.json()
-    
+        response = await self._get_client().post("/admin/quota/reset")
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
     async def set_quota(self, count: int) -> Dict[str, Any]:
         """Set quota to specific value (admin)."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(f"{self.base_url}/admin/quota/set/{count}")
-            response.raise_for_status()
-            return response.json()
-    
-    
+        response = await self._get_client().post(f"/admin/quota/set/{count}")
+        response.raise_for_status()
+        return orjson.loads(response.content)
+
+
     async def toggle_failure_simulation(self, enable: bool) -> Dict[str, Any]:
         """Toggle failure simulation (admin)."""
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.base_url}/admin/simulate-failure",
-                json={"enable": enable}
-            )
-            response.raise_for_status()
-            return response.json()
+        response = await self._get_client().post(
+            "/admin/simulate-failure",
+            content=orjson.dumps({"enable": enable}),
+            headers={"content-type": "application/json"}
+        )
+        response.raise_for_status()
+        return orjson.loads(response.content)
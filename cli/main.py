@@ -4,18 +4,12 @@ Beautiful terminal interface with real-time status updates.
 """
 
 import asyncio
-import sys
+import os
 from datetime import date, datetime
-from typing import Optional, List
 
 from rich.console import Console
 from rich.panel import Panel
-from rich.table import Table
 from rich.prompt import Prompt, Confirm
-from rich.progress import Progress, SpinnerColumn, TextColumn
-from rich.live import Live
-from rich.layout import Layout
-from rich.text import Text
 from rich import box
 
 from api_client import BookingAPIClient
@@ -37,6 +31,8 @@ def print_header():
 
 def print_services_table(services: list, gender: str):
     """Print services in a beautiful table."""
+    from rich.table import Table  # deferred: only the booking flow renders tables
+
     table = Table(
         title=f"[bold]Available Services for {gender.capitalize()}[/bold]",
         box=box.ROUNDED,
@@ -120,6 +116,40 @@ def print_failure_result(result: dict):
     ))
 
 
+
+# Exact status -> (color, glyph) styling for the event stream; one dict
+# lookup per event instead of lowercasing and substring-scanning each one.
+_STATUS_STYLE = {
+    "compensating": ("yellow", "↩"),
+    "compensated": ("yellow", "↩"),
+    "failed": ("red", "✗"),
+    "quota_exhausted": ("red", "✗"),
+    "validation_completed": ("green", "✓"),
+    "pricing_completed": ("green", "✓"),
+    "quota_reserved": ("green", "✓"),
+    "completed": ("green", "✓"),
+}
+
+
+async def stream_transaction_events(client: BookingAPIClient, request_id: str):
+    """Render the SSE event stream for a booking until its final result."""
+    async for update in client.stream_booking_status(request_id):
+        if "error" in update:
+            console.print(f"  [red]✗[/red] {update['error']}")
+            return
+
+        if "final_result" in update:
+            result = update["final_result"]
+            if result.get("success"):
+                print_success_result(result)
+            else:
+                print_failure_result(result)
+            return
+
+        color, glyph = _STATUS_STYLE.get(update.get("status", ""), ("blue", "→"))
+        console.print(f"  [{color}]{glyph}[/{color}] {update.get('message', '')}")
+
+
 async def run_booking_flow(client: BookingAPIClient):
     """Run the main booking flow."""
     print_header()
@@ -136,10 +166,11 @@ async def run_booking_flow(client: BookingAPIClient):
         default="female"
     )
     
+    today_str = datetime.now().strftime("%Y-%m-%d")  # Default to today for birthday demo
     while True:
         dob_str = Prompt.ask(
             "[cyan]Enter date of birth (YYYY-MM-DD)[/cyan]",
-            default=datetime.now().strftime("%Y-%m-%d")  # Default to today for birthday demo
+            default=today_str
         )
         try:
             dob = date.fromisoformat(dob_str)
@@ -164,26 +195,36 @@ async def run_booking_flow(client: BookingAPIClient):
         selection = Prompt.ask(
             "[cyan]Select services (comma-separated numbers, e.g., 1,2,3)[/cyan]"
         )
-        try:
-            indices = [int(x.strip()) - 1 for x in selection.split(",")]
-            selected_ids = [services[i]["id"] for i in indices if 0 <= i < len(services)]
-            if selected_ids:
+        # Single pass: validate each token and collect ids as we go
+        selected_ids = []
+        n = len(services)
+        valid = True
+        for token in selection.split(","):
+            token = token.strip()
+            if not token.isdigit():
+                valid = False
                 break
-            console.print("[red]Please select at least one valid service[/red]")
-        except (ValueError, IndexError):
+            i = int(token) - 1
+            if 0 <= i < n:
+                selected_ids.append(services[i]["id"])
+        if not valid:
             console.print("[red]Invalid selection. Enter comma-separated numbers[/red]")
+        elif selected_ids:
+            break
+        else:
+            console.print("[red]Please select at least one valid service[/red]")
     
-    # Show selected services
-    console.print()
-    console.print("[bold]Selected Services:[/bold]")
+    # Show selected services (id-indexed: no rescan per selection)
+    by_id = {s["id"]: s for s in services}
+    lines = ["", "[bold]Selected Services:[/bold]"]
     total = 0
     for sid in selected_ids:
-        service = next((s for s in services if s["id"] == sid), None)
+        service = by_id.get(sid)
         if service:
-            console.print(f"  • {service['name']} - ₹{service['price']:,.0f}")
+            lines.append(f"  • {service['name']} - ₹{service['price']:,.0f}")
             total += service['price']
-    console.print(f"\n[bold]Estimated Total:[/bold] ₹{total:,.0f}")
-    console.print()
+    lines.append(f"\n[bold]Estimated Total:[/bold] ₹{total:,.0f}\n")
+    console.print("\n".join(lines))
     
     # Confirm
     if not Confirm.ask("[cyan]Proceed with booking?[/cyan]"):
@@ -196,6 +237,8 @@ async def run_booking_flow(client: BookingAPIClient):
     console.print("-" * 40)
     console.print()
     
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -210,7 +253,6 @@ async def run_booking_flow(client: BookingAPIClient):
             request_id = response.get("request_id")
             
             progress.update(task, description=f"[cyan]Request ID: {request_id}")
-            await asyncio.sleep(0.5)
             
         except Exception as e:
             console.print(f"[red]Error submitting booking: {e}[/red]")
@@ -223,107 +265,88 @@ async def run_booking_flow(client: BookingAPIClient):
     # Display events in real-time using SSE
     console.print("[bold]Transaction Events:[/bold]")
     try:
-        async for update in client.stream_booking_status(request_id):
-            if "error" in update:
-                console.print(f"  [red]✗[/red] {update['error']}")
-                break
-                
-            if "final_result" in update:
-                result = update["final_result"]
-                if result.get("success"):
-                    print_success_result(result)
-                else:
-                    print_failure_result(result)
-                break
-                
-            # Print regular event
-            msg = update.get("message", "")
-            status = update.get("status", "")
-            
-            if "compensat" in status.lower():
-                console.print(f"  [yellow]↩[/yellow] {msg}")
-            elif "reserved (over limit)" in msg.lower() or "reserved over limit" in msg.lower():
-                console.print(f"  [yellow]⊕[/yellow] {msg}")
-            elif "failed" in status.lower() or "exhausted" in status.lower():
-                console.print(f"  [red]✗[/red] {msg}")
-            elif "completed" in status.lower() or "reserved" in status.lower():
-                console.print(f"  [green]✓[/green] {msg}")
-            else:
-                console.print(f"  [blue]→[/blue] {msg}")
-                
+        await stream_transaction_events(client, request_id)
     except Exception as e:
         console.print(f"[red]Error during status stream: {e}[/red]")
-    except Exception as e:
-        console.print(f"[red]Error getting booking result: {e}[/red]")
 
 
+
+# Scenario banners are static; build the Panels once at import
+_SCENARIO_PANELS = {
+    1: Panel(
+        "[bold green]Test Scenario 1: Successful Birthday Discount[/bold green]\n\n"
+        "• Female user with today as birthday\n"
+        "• Multiple services selected\n"
+        "• Expected: 12% birthday discount applied",
+        border_style="green"
+    ),
+    2: Panel(
+        "[bold red]Test Scenario 2: Quota Exceeded + Compensation[/bold red]\n\n"
+        "• Set quota to max (100)\n"
+        "• Female user with birthday (R1 eligible)\n"
+        "• Expected: Atomic check rejects over limit → failure → compensation finalizes",
+        border_style="red"
+    ),
+    3: Panel(
+        "[bold red]Test Scenario 3: Booking Failure + Compensation[/bold red]\n\n"
+        "• High-value order (>₹1000) to trigger R1 discount\n"
+        "• Simulated booking service failure\n"
+        "• Expected: Failure after quota reservation, compensation triggered",
+        border_style="red"
+    ),
+}
+
 async def run_test_scenario(client: BookingAPIClient, scenario: int):
     """Run a specific test scenario."""
     console.print()
+    today = date.today()  # one clock read; scenario 3 overrides with a fixed DOB
     
     if scenario == 1:
         # Positive case: Birthday discount
-        console.print(Panel(
-            "[bold green]Test Scenario 1: Successful Birthday Discount[/bold green]\n\n"
-            "• Female user with today as birthday\n"
-            "• Multiple services selected\n"
-            "• Expected: 12% birthday discount applied",
-            border_style="green"
-        ))
-        
-        # Reset quota first
-        await client.reset_quota()
-        await client.toggle_failure_simulation(False)
+        console.print(_SCENARIO_PANELS[1])
         
-        today = date.today()
         name = "Priya Sharma"
         gender = "female"
         
-        services_data = await client.get_services(gender)
+        # Setup calls are independent; overlap their round-trips
+        _, _, services_data = await asyncio.gather(
+            client.reset_quota(),
+            client.toggle_failure_simulation(False),
+            client.get_services(gender)
+        )
         services = services_data.get("services", [])
         selected_ids = [services[0]["id"], services[1]["id"]]  # First two services
         
     elif scenario == 2:
-        # Negative case: Quota exceeded → commit reserve, then compensation reverts it
-        console.print(Panel(
-            "[bold red]Test Scenario 2: Quota Exceeded + Compensation[/bold red]\n\n"
-            "• Set quota to max (100)\n"
-            "• Female user with birthday (R1 eligible)\n"
-            "• Expected: Reserve committed over limit → failure → compensation reverts (Quota released)",
-            border_style="red"
-        ))
+        # Negative case: quota exhausted, atomic check rejects without reserving
+        console.print(_SCENARIO_PANELS[2])
         
-        # Set quota to max so next booking hits quota exceeded
-        await client.set_quota(100)  # Set to max
-        await client.toggle_failure_simulation(False)
-        
-        today = date.today()
         name = "Anjali Mehta"
         gender = "female"
         
-        services_data = await client.get_services(gender)
+        # Set quota to max so next booking hits quota exceeded
+        _, _, services_data = await asyncio.gather(
+            client.set_quota(100),
+            client.toggle_failure_simulation(False),
+            client.get_services(gender)
+        )
         services = services_data.get("services", [])
         selected_ids = [services[0]["id"]]
         
     elif scenario == 3:
         # Negative case: Booking failure with compensation
-        console.print(Panel(
-            "[bold red]Test Scenario 3: Booking Failure + Compensation[/bold red]\n\n"
-            "• High-value order (>₹1000) to trigger R1 discount\n"
-            "• Simulated booking service failure\n"
-            "• Expected: Failure after quota reservation, compensation triggered",
-            border_style="red"
-        ))
-        
-        # Reset quota and enable failure
-        await client.reset_quota()
-        await client.toggle_failure_simulation(True)
+        console.print(_SCENARIO_PANELS[3])
         
         name = "Rahul Kumar"
         gender = "male"
         today = date(1990, 5, 15)  # Not birthday
         
-        services_data = await client.get_services(gender)
+        # Reset quota and enable failure
+        _, _, services_data = await asyncio.gather(
+            client.reset_quota(),
+            client.toggle_failure_simulation(True),
+            client.get_services(gender)
+        )
         services = services_data.get("services", [])
         # Select high-value services (>1000)
         selected_ids = [s["id"] for s in services if s["price"] >= 500][:3]
@@ -332,15 +355,17 @@ async def run_test_scenario(client: BookingAPIClient, scenario: int):
         console.print("[red]Invalid scenario[/red]")
         return
     
-    # Show what we're doing
-    console.print()
-    console.print(f"[bold]User:[/bold] {name}")
-    console.print(f"[bold]Gender:[/bold] {gender}")
-    console.print(f"[bold]DOB:[/bold] {today}")
-    console.print(f"[bold]Services:[/bold] {selected_ids}")
-    console.print()
+    # Show what we're doing (single render)
+    console.print(
+        f"\n[bold]User:[/bold] {name}\n"
+        f"[bold]Gender:[/bold] {gender}\n"
+        f"[bold]DOB:[/bold] {today}\n"
+        f"[bold]Services:[/bold] {selected_ids}\n"
+    )
     
     # Submit booking
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
@@ -359,43 +384,21 @@ async def run_test_scenario(client: BookingAPIClient, scenario: int):
     # Display events in real-time
     console.print("[bold]Transaction Events:[/bold]")
     try:
-        async for update in client.stream_booking_status(request_id):
-            if "error" in update:
-                console.print(f"  [red]✗[/red] {update['error']}")
-                break
-                
-            if "final_result" in update:
-                result = update["final_result"]
-                if result.get("success"):
-                    print_success_result(result)
-                else:
-                    print_failure_result(result)
-                break
-                
-            # Print regular event
-            msg = update.get("message", "")
-            status = update.get("status", "")
-            
-            if "compensat" in status.lower():
-                console.print(f"  [yellow]↩[/yellow] {msg}")
-            elif "reserved (over limit)" in msg.lower() or "reserved over limit" in msg.lower():
-                console.print(f"  [yellow]⊕[/yellow] {msg}")
-            elif "failed" in status.lower() or "exhausted" in status.lower():
-                console.print(f"  [red]✗[/red] {msg}")
-            elif "completed" in status.lower() or "reserved" in status.lower():
-                console.print(f"  [green]✓[/green] {msg}")
-            else:
-                console.print(f"  [blue]→[/blue] {msg}")
-                
+        await stream_transaction_events(client, request_id)
     except Exception as e:
         console.print(f"[red]Error: {e}[/red]")
     
     # Show compensation proof for scenarios 2 and 3
     if scenario in (2, 3):
-        if scenario == 3:
-            await client.toggle_failure_simulation(False)
         console.print()
-        quota = await client.get_quota_status()
+        if scenario == 3:
+            # Cleanup and status are independent; overlap the round-trips
+            _, quota = await asyncio.gather(
+                client.toggle_failure_simulation(False),
+                client.get_quota_status()
+            )
+        else:
+            quota = await client.get_quota_status()
         console.print(f"[dim]Quota after compensation: {quota['current_count']}/{quota['max_quota']}[/dim]")
 
 
@@ -404,16 +407,18 @@ async def main_menu(client: BookingAPIClient):
     while True:
         print_header()
         
-        console.print("[bold]Main Menu[/bold]")
-        console.print("-" * 40)
-        console.print("1. [cyan]New Booking[/cyan] - Interactive booking flow")
-        console.print("2. [green]Test Scenario 1[/green] - Successful birthday discount")
-        console.print("3. [red]Test Scenario 2[/red] - Quota exhausted")
-        console.print("4. [red]Test Scenario 3[/red] - Booking failure + compensation")
-        console.print("5. [yellow]View Quota Status[/yellow]")
-        console.print("6. [yellow]Reset Quota[/yellow]")
-        console.print("0. [dim]Exit[/dim]")
-        console.print()
+        # One render/flush for the static menu instead of nine
+        console.print(
+            "[bold]Main Menu[/bold]\n"
+            + "-" * 40 + "\n"
+            "1. [cyan]New Booking[/cyan] - Interactive booking flow\n"
+            "2. [green]Test Scenario 1[/green] - Successful birthday discount\n"
+            "3. [red]Test Scenario 2[/red] - Quota exhausted\n"
+            "4. [red]Test Scenario 3[/red] - Booking failure + compensation\n"
+            "5. [yellow]View Quota Status[/yellow]\n"
+            "6. [yellow]Reset Quota[/yellow]\n"
+            "0. [dim]Exit[/dim]\n"
+        )
         
         choice = Prompt.ask(
             "[cyan]Select option[/cyan]",
@@ -454,26 +459,31 @@ async def main_menu(client: BookingAPIClient):
 async def main():
     """Main entry point."""
     # Get backend URL from environment or use default
-    import os
     backend_url = os.getenv("BACKEND_URL", "http://localhost:8080")
     
-    client = BookingAPIClient(backend_url)
-    
-    # Check health
-    console.print("[dim]Connecting to backend...[/dim]")
-    try:
-        health = await client.health_check()
-        if health.get("redis_connected"):
-            console.print("[green]✓ Connected to backend[/green]")
-        else:
-            console.print("[yellow]⚠ Backend connected but Redis unavailable[/yellow]")
-    except Exception as e:
-        console.print(f"[red]✗ Failed to connect to backend: {e}[/red]")
-        console.print(f"[dim]Make sure the backend is running at {backend_url}[/dim]")
-        return
-    
-    await main_menu(client)
+    async with BookingAPIClient(backend_url) as client:
+        # Check health
+        console.print("[dim]Connecting to backend...[/dim]")
+        try:
+            health = await client.health_check()
+            if health.get("redis_connected"):
+                console.print("[green]✓ Connected to backend[/green]")
+            else:
+                console.print("[yellow]⚠ Backend connected but Redis unavailable[/yellow]")
+        except Exception as e:
+            console.print(f"[red]✗ Failed to connect to backend: {e}[/red]")
+            console.print(f"[dim]Make sure the backend is running at {backend_url}[/dim]")
+            return
+        
+        await main_menu(client)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    try:
+        import uvloop
+    except ImportError:
+        # uvloop is unavailable on Windows; default loop works fine
+        asyncio.run(main())
+    else:
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(main())
@@ -5,7 +5,10 @@ Expects PYTHONPATH to include the backend app (e.g. PYTHONPATH=../../backend).
 """
 
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
+import time
 from pathlib import Path
 
 # Ensure backend app is on path (for local run and Docker with PYTHONPATH=/app/backend)
@@ -14,6 +17,7 @@ if _backend.exists() and str(_backend) not in sys.path:
     sys.path.insert(0, str(_backend))
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 from app.events.publisher import event_publisher
@@ -21,13 +25,29 @@ from app.services.pricing import pricing_service
 from app.services.quota import quota_service
 from app.services.booking import booking_service
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+# Format and write log records on a background thread so the asctime
+# formatting and stream IO stay off the request path
+_log_queue = queue.SimpleQueue()
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(
+    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+)
+_queue_handler = QueueHandler(_log_queue)
+# prepare() applies this when enqueueing; keep it to the bare message so the
+# listener's handler does the real formatting exactly once
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+_log_listener = QueueListener(_log_queue, _stream_handler)
+_log_listener.start()
 logger = logging.getLogger(__name__)
+# Checked once: request handlers skip building log args when INFO is off
+_LOG_INFO = logger.isEnabledFor(logging.INFO)
 
 app = FastAPI(
     title="Pricing & Booking Service",
     description="Pricing, quota, and booking microservice for booking SAGA",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -35,6 +55,28 @@ class RequestIdBody(BaseModel):
     request_id: str
 
 
+# Short-TTL state cache: GCP Workflows calls /price, /reserve-quota and
+# /create-booking back-to-back for the same request_id, and each step would
+# otherwise re-read the state from Redis. The cached object is the same one
+# the services mutate and save (delta writes), so steps within the window
+# stay coherent without invalidation hooks.
+_STATE_TTL = 5.0
+_state_cache = {}
+
+
+async def _get_state(request_id: str):
+    now = time.monotonic()
+    entry = _state_cache.get(request_id)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    state = await event_publisher.get_transaction_state(request_id)
+    if state is not None:
+        if len(_state_cache) > 10_000:  # cheap pressure valve
+            _state_cache.clear()
+        _state_cache[request_id] = (now + _STATE_TTL, state)
+    return state
+
+
 @app.get("/health")
 async def health():
     return {"status": "healthy", "service": "pricing-booking"}
@@ -44,9 +86,10 @@ async def health():
 async def price(body: RequestIdBody):
     """Calculate price and R1 eligibility. Used by GCP Workflows."""
     request_id = body.request_id
-    logger.info("Price request", extra={"request_id": request_id})
+    if _LOG_INFO:
+        logger.info("Price request", extra={"request_id": request_id})
 
-    state = await event_publisher.get_transaction_state(request_id)
+    state = await _get_state(request_id)
     if not state:
         return {"success": False, "message": "Booking not found"}
 
@@ -54,7 +97,7 @@ async def price(body: RequestIdBody):
     return {
         "success": ok,
         "message": message or ("Pricing completed" if ok else "Pricing failed"),
-        "r1_eligible": getattr(state, "r1_eligible", False),
+        "r1_eligible": state.r1_eligible,
     }
 
 
@@ -62,9 +105,10 @@ async def price(body: RequestIdBody):
 async def reserve_quota(body: RequestIdBody):
     """Reserve discount quota (R2). Used by GCP Workflows."""
     request_id = body.request_id
-    logger.info("Reserve quota request", extra={"request_id": request_id})
+    if _LOG_INFO:
+        logger.info("Reserve quota request", extra={"request_id": request_id})
 
-    state = await event_publisher.get_transaction_state(request_id)
+    state = await _get_state(request_id)
     if not state:
         return {"success": False, "message": "Booking not found"}
 
@@ -72,34 +116,75 @@ async def reserve_quota(body: RequestIdBody):
     return {"success": ok, "message": message or ("Quota reserved" if ok else "Quota exhausted")}
 
 
+# Completed-booking responses, kept so workflow reliability retries are
+# answered from memory instead of re-running the booking step (which would
+# mint a fresh reference ID and republish events).
+_completed_results = {}
+_COMPLETED_TTL = 600.0
+
+
 @app.post("/create-booking")
 async def create_booking(body: RequestIdBody):
     """Create final booking. Used by GCP Workflows."""
     request_id = body.request_id
-    logger.info("Create booking request", extra={"request_id": request_id})
+    if _LOG_INFO:
+        logger.info("Create booking request", extra={"request_id": request_id})
 
-    state = await event_publisher.get_transaction_state(request_id)
+    now = time.monotonic()
+    cached = _completed_results.get(request_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+
+    state = await _get_state(request_id)
     if not state:
         return {"success": False, "message": "Booking not found"}
 
     ok, message = await booking_service.create_booking(state)
-    reference_id = getattr(state, "reference_id", None)
-    return {
+    result = {
         "success": ok,
         "message": message or ("Booking created" if ok else "Booking failed"),
-        "reference_id": reference_id,
+        "reference_id": state.reference_id,
     }
+    if ok:
+        if len(_completed_results) > 10_000:
+            _completed_results.clear()
+        _completed_results[request_id] = (now + _COMPLETED_TTL, result)
+    return result
+
+
+# Request IDs whose quota was already released (id -> monotonic expiry).
+# Workflows can invoke compensation more than once for the same aborted
+# request; repeats within the window return without any Redis traffic.
+_released_rids = {}
+_RELEASED_TTL = 600.0
 
 
 @app.post("/release-quota")
 async def release_quota(body: RequestIdBody):
     """Release reserved quota (compensation). Used by GCP Workflows on failure."""
     request_id = body.request_id
-    logger.info("Release quota request", extra={"request_id": request_id})
+    if _LOG_INFO:
+        logger.info("Release quota request", extra={"request_id": request_id})
 
-    state = await event_publisher.get_transaction_state(request_id)
+    now = time.monotonic()
+    expiry = _released_rids.get(request_id)
+    if expiry is not None and expiry > now:
+        return {"success": True, "message": "Quota already released"}
+
+    state = await _get_state(request_id)
     if not state:
         return {"success": True, "message": "No state to compensate"}
 
+    if not state.quota_reserved:
+        # The workflow routes every failed branch here, including quota
+        # exhaustion — which commits nothing — and bookings that never
+        # reserved. A DECR without a held slot would free one owned by
+        # another booking and bust the daily cap.
+        return {"success": True, "message": "No quota reserved"}
+
     released = await quota_service.release_quota(state)
+    if released:
+        if len(_released_rids) > 10_000:
+            _released_rids.clear()
+        _released_rids[request_id] = now + _RELEASED_TTL
     return {"success": released, "message": "Quota released" if released else "Release failed"}
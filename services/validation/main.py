@@ -5,7 +5,10 @@ Expects PYTHONPATH to include the backend app (e.g. PYTHONPATH=../../backend).
 """
 
 import logging
+import queue
 import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 # Ensure backend app is on path (for local run and Docker with PYTHONPATH=/app/backend)
@@ -14,15 +17,31 @@ if _backend.exists() and str(_backend) not in sys.path:
     sys.path.insert(0, str(_backend))
 
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 from app.events.publisher import event_publisher
 from app.services.validation import validation_service
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+# Format and write log records on a background thread so the asctime
+# formatting and stream IO stay off the request path
+_log_queue = queue.SimpleQueue()
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(
+    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+)
+_queue_handler = QueueHandler(_log_queue)
+# prepare() applies this when enqueueing; keep it to the bare message so the
+# listener's handler does the real formatting exactly once
+_queue_handler.setFormatter(logging.Formatter("%(message)s"))
+logging.basicConfig(level=logging.INFO, handlers=[_queue_handler])
+_log_listener = QueueListener(_log_queue, _stream_handler)
+_log_listener.start()
 logger = logging.getLogger(__name__)
+# Checked once: request handlers skip building log args when INFO is off
+_LOG_INFO = logger.isEnabledFor(logging.INFO)
 
-app = FastAPI(title="Validation Service", description="Validation microservice for booking SAGA", version="1.0.0")
+app = FastAPI(title="Validation Service", description="Validation microservice for booking SAGA", version="1.0.0", default_response_class=ORJSONResponse)
 
 
 class ValidateRequest(BaseModel):
@@ -34,11 +53,23 @@ async def health():
     return {"status": "healthy", "service": "validation"}
 
 
+# Successful validation responses, cached so workflow retries don't reload
+# state and re-run (and re-publish) the validation step.
+_validated_results = {}
+_VALIDATED_TTL = 600.0
+
+
 @app.post("/validate")
 async def validate(body: ValidateRequest):
     """Validate user and services for a booking. Used by GCP Workflows."""
     request_id = body.request_id
-    logger.info("Validation request", extra={"request_id": request_id})
+    if _LOG_INFO:
+        logger.info("Validation request", extra={"request_id": request_id})
+
+    now = time.monotonic()
+    cached = _validated_results.get(request_id)
+    if cached is not None and cached[0] > now:
+        return cached[1]
 
     state = await event_publisher.get_transaction_state(request_id)
     if not state:
@@ -46,4 +77,9 @@ async def validate(body: ValidateRequest):
         return {"success": False, "message": "Booking not found"}
 
     ok, message, _ = await validation_service.validate(state)
-    return {"success": ok, "message": message or ("Validation successful" if ok else "Validation failed")}
+    result = {"success": ok, "message": message or ("Validation successful" if ok else "Validation failed")}
+    if ok:
+        if len(_validated_results) > 10_000:
+            _validated_results.clear()
+        _validated_results[request_id] = (now + _VALIDATED_TTL, result)
+    return result